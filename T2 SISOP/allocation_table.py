@@ -1,4 +1,8 @@
+import functools
+import heapq
 import struct
+import sys
+from array import array
 
 # Configurações
 FAT_FREE = 0x0000
@@ -6,27 +10,95 @@ FAT_EOF = 0x7FFF
 FAT_RESERVED = 0x7FFE
 FAT_ENTRIES = 2048
 
+# Formato da FAT em disco (little-endian), compilado uma única vez
+_FAT_STRUCT = struct.Struct(f"<{FAT_ENTRIES}H")
+
+
+@functools.lru_cache(maxsize=64)
+def _fat_run_struct(length):
+    """Retorna o Struct de uma sequência de entradas consecutivas da FAT."""
+    return struct.Struct(f"<{length}H")
+
+
 class FileAllocationTable:
     def __init__(self):
-        self.fat = [FAT_FREE] * 2048  # FAT com 2048 entradas
+        self.fat = array("H", [FAT_FREE]) * FAT_ENTRIES  # FAT com 2048 entradas
+        self._free = list(range(FAT_ENTRIES))  # Heap com os índices dos blocos livres
+
+    def _rebuild_free_list(self):
+        """Reconstrói o heap de blocos livres a partir da FAT."""
+        self._free = [i for i, entry in enumerate(self.fat) if entry == FAT_FREE]
+        heapq.heapify(self._free)
 
     def initialize(self):
         """Inicializa a FAT com blocos reservados."""
-        for i in range(4):  # Reservar os blocos da FAT
-            self.fat[i] = FAT_RESERVED
+        self.fat[:4] = array("H", [FAT_RESERVED]) * 4  # Reservar os blocos da FAT
+        self._rebuild_free_list()
 
     def find_free_block(self):
         """Encontra o índice do primeiro bloco livre na FAT."""
-        for i, entry in enumerate(self.fat):
-            if entry == FAT_FREE:  # Verifica se o bloco está livre
-                return i
-        return -1  # Retorna -1 se nenhum bloco livre estiver disponível
+        if not self._free:
+            return -1  # Retorna -1 se nenhum bloco livre estiver disponível
+        assert self.fat[self._free[0]] == FAT_FREE, "heap de blocos livres inconsistente"
+        return self._free[0]
+
+    def mark_used(self, index, value=FAT_EOF):
+        """Marca um bloco livre como ocupado e o retira do heap de livres."""
+        self.fat[index] = value
+        if self._free and self._free[0] == index:
+            heapq.heappop(self._free)
+        else:
+            self._free.remove(index)
+            heapq.heapify(self._free)
+
+    def free_blocks(self, blocks):
+        """Marca os blocos como livres e os devolve de uma só vez ao heap de livres."""
+        fat = self.fat
+        for index in blocks:
+            fat[index] = FAT_FREE
+
+        # Para cadeias longas, reconstruir o heap é mais barato que k inserções
+        if len(blocks) * len(self._free).bit_length() > len(self._free):
+            self._free.extend(blocks)
+            heapq.heapify(self._free)
+        else:
+            for index in blocks:
+                heapq.heappush(self._free, index)
+
+    def used_blocks(self):
+        """Retorna a quantidade de blocos ocupados na FAT."""
+        return len(self.fat) - len(self._free)  # O heap guarda exatamente os blocos livres
 
     def to_bytes(self):
         """Converte a FAT em bytes para persistência."""
-        return struct.pack("2048H", *self.fat)
+        return _FAT_STRUCT.pack(*self.fat)
+
+    def pack_into(self, buffer, offset):
+        """Escreve a FAT em um buffer a partir do offset."""
+        _FAT_STRUCT.pack_into(buffer, offset, *self.fat)
+
+    def pack_entries_into(self, buffer, offset, indices):
+        """Escreve as entradas indicadas da FAT em um buffer onde a FAT começa no offset.
+
+        Índices consecutivos são agrupados e escritos de uma só vez.
+        """
+        indices = sorted(indices)
+        start = 0
+        while start < len(indices):
+            end = start + 1
+            while end < len(indices) and indices[end] == indices[end - 1] + 1:
+                end += 1
+
+            first, length = indices[start], end - start
+            run_struct = _fat_run_struct(length)
+            run_struct.pack_into(buffer, offset + first * self.fat.itemsize, *self.fat[first:first + length])
+            start = end
 
     def from_bytes(self, data):
         """Carrega a FAT a partir de bytes."""
-        self.fat = list(struct.unpack("2048H", data))
-
+        fat = array("H")
+        fat.frombytes(data[:_FAT_STRUCT.size])
+        if sys.byteorder != "little":
+            fat.byteswap()  # O formato em disco é sempre little-endian
+        self.fat = fat
+        self._rebuild_free_list()
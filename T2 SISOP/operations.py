@@ -1,6 +1,7 @@
+import mmap
 import os
 import struct
-from allocation_table import FileAllocationTable, FAT_FREE, FAT_EOF
+from allocation_table import FileAllocationTable, FAT_EOF
 
 # Configurações
 BLOCK_SIZE = 1024
@@ -14,45 +15,118 @@ DIR_FILE = 0x01       # Arquivo regular
 
 FILESYSTEM = "filesystem.dat"
 
+# Formato de uma entrada de diretório em disco (32 bytes), compilado uma única vez
+_ENTRY_STRUCT = struct.Struct("<25sBHI")
+
 
 class DirectoryEntry:
     """Representa uma entrada de diretório."""
     def __init__(self, filename="", attributes=DIR_EMPTY, first_block=0, size=0):
-        self.filename = filename.ljust(25)[:25]
+        self.filename = filename.encode()[:25]  # O struct completa o campo com zeros
+        self.name = self.filename.decode(errors="ignore").strip()  # Nome como fica gravado, usado nas comparações
         self.attributes = attributes
         self.first_block = first_block
         self.size = size
 
     def to_bytes(self):
         """Converte a entrada de diretório para bytes."""
-        return struct.pack("25sBHI", self.filename.encode(), self.attributes, self.first_block, self.size)
+        return _ENTRY_STRUCT.pack(self.filename, self.attributes, self.first_block, self.size)
+
+    def pack_into(self, buffer, offset):
+        """Escreve a entrada de diretório em um buffer a partir do offset."""
+        _ENTRY_STRUCT.pack_into(buffer, offset, self.filename, self.attributes, self.first_block, self.size)
 
     @staticmethod
     def from_bytes(data):
         """Cria uma entrada de diretório a partir de bytes."""
-        filename, attributes, first_block, size = struct.unpack("25sBHI", data)
-        return DirectoryEntry(filename.decode().strip(), attributes, first_block, size)
+        return DirectoryEntry.from_tuple(_ENTRY_STRUCT.unpack(data))
+
+    @staticmethod
+    def from_tuple(fields):
+        """Cria uma entrada de diretório a partir dos campos já desempacotados."""
+        filename, attributes, first_block, size = fields
+        # Aceita tanto o preenchimento com zeros quanto o com espaços de imagens antigas
+        return DirectoryEntry(filename.rstrip(b"\x00 ").decode(errors="ignore"), attributes, first_block, size)
+
+
+class Directory:
+    """Entradas de um bloco de diretório, indexadas pelo nome das entradas ocupadas."""
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self._name_index = {
+            entry.name: i
+            for i, entry in enumerate(self.entries)
+            if entry.attributes != DIR_EMPTY
+        }
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, index):
+        return self.entries[index]
+
+    def __setitem__(self, index, entry):
+        """Substitui a entrada na posição especificada mantendo o índice atualizado."""
+        old_name = self.entries[index].name
+        if self._name_index.get(old_name) == index:
+            del self._name_index[old_name]
+        self.entries[index] = entry
+        if entry.attributes != DIR_EMPTY:
+            self._name_index[entry.name] = index
+
+    def find(self, name):
+        """Retorna a posição da entrada ocupada com o nome especificado, ou None."""
+        return self._name_index.get(name)
 
 
 class FileSystemOperations:
     """Gerencia as operações do sistema de arquivos."""
     def __init__(self):
         self.fat = FileAllocationTable()
-        self.root = [DirectoryEntry() for _ in range(ROOT_ENTRIES)]
+        self.root = Directory(DirectoryEntry() for _ in range(ROOT_ENTRIES))
+        self._mm = None  # Arquivo do sistema de arquivos mapeado em memória
+        self._loaded = False  # Indica se a FAT e o diretório raiz em memória refletem o disco
+        self._dirty_fat = set()   # Entradas da FAT alteradas desde a última persistência
+        self._dirty_root = set()  # Entradas do diretório raiz alteradas desde a última persistência
+
+    def _ensure_mapped(self):
+        """Mapeia o arquivo do sistema de arquivos em memória no primeiro acesso."""
+        if self._mm is None:
+            with open(FILESYSTEM, "r+b") as f:
+                self._mm = mmap.mmap(f.fileno(), 0)
+        return self._mm
+
+    def close(self):
+        """Grava as páginas alteradas no disco e desfaz o mapeamento do arquivo."""
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._mm = None
 
     def initialize_filesystem(self):
         """Inicializa o sistema de arquivos."""
-        with open(FILESYSTEM, "wb") as f:
-            # Inicializa a FAT
-            self.fat.initialize()
-            f.write(self.fat.to_bytes())
+        # Monta apenas os blocos de metadados (FAT e diretório raiz)
+        metadata = bytearray((FAT_BLOCKS + ROOT_BLOCKS) * BLOCK_SIZE)
+
+        # Inicializa a FAT
+        self.fat.initialize()
+        self.fat.pack_into(metadata, 0)
 
-            # Inicializa o diretório raiz
-            root_bytes = [entry.to_bytes() for entry in self.root]
-            f.write(b"".join(root_bytes))
+        # Inicializa o diretório raiz
+        self._pack_directory(self.root, metadata, FAT_BLOCKS * BLOCK_SIZE)
 
-            # Preenche os blocos de dados restantes com zeros
-            f.write(b"\x00" * (BLOCK_SIZE * (TOTAL_BLOCKS - FAT_BLOCKS - ROOT_BLOCKS)))
+        # O arquivo será recriado; o mapeamento antigo deixa de ser válido
+        self.close()
+        with open(FILESYSTEM, "wb") as f:
+            # Os blocos de dados são preenchidos com zeros pelo próprio truncate
+            f.truncate(TOTAL_BLOCKS * BLOCK_SIZE)
+            f.write(metadata)
+        self._dirty_fat.clear()
+        self._dirty_root.clear()
+        self._loaded = True
         print("Sistema de arquivos inicializado.")
 
     def mkdir(self, path):
@@ -62,6 +136,9 @@ class FileSystemOperations:
             return
 
         dir_name = path.strip("/")
+        if not dir_name:
+            print("Erro: Caminho inválido. Informe o nome do diretório.")
+            return
         if len(dir_name) > 25:
             print("Erro: Nome do diretório muito longo. Máximo de 25 caracteres.")
             return
@@ -70,10 +147,9 @@ class FileSystemOperations:
         self.load_filesystem()
 
         # Verificar se o diretório já existe
-        for entry in self.root:
-            if entry.filename.strip() == dir_name:
-                print(f"Erro: Diretório '{dir_name}' já existe.")
-                return
+        if self.find_dir_entry(self.root, dir_name) is not None:
+            print(f"Erro: Diretório '{dir_name}' já existe.")
+            return
 
         # Procurar uma entrada vazia no diretório raiz
         for i, entry in enumerate(self.root):
@@ -85,13 +161,15 @@ class FileSystemOperations:
                     return
 
                 # Atualizar a FAT e criar a entrada do diretório
-                self.fat.fat[free_block] = FAT_EOF
+                self.fat.mark_used(free_block)
+                self._dirty_fat.add(free_block)
                 self.root[i] = DirectoryEntry(
                     filename=dir_name,
                     attributes=DIR_DIRECTORY,
                     first_block=free_block,
                     size=0,
                 )
+                self._dirty_root.add(i)
                 print(f"Diretório '{dir_name}' criado com sucesso.")
                 break
         else:
@@ -99,19 +177,11 @@ class FileSystemOperations:
             return
 
         # Persistir alterações no disco
-        with open(FILESYSTEM, "r+b") as f:
-            # Atualizar a FAT
-            f.seek(0)
-            f.write(self.fat.to_bytes())
-
-            # Atualizar o diretório raiz
-            root_bytes = [entry.to_bytes() for entry in self.root]
-            f.seek(FAT_BLOCKS * BLOCK_SIZE)
-            f.write(b"".join(root_bytes))
+        self.persist_changes()
 
     def fat_info(self):
         """Exibe informações sobre a capacidade usada e livre na FAT."""
-        used_blocks = sum(1 for entry in self.fat.fat if entry != FAT_FREE)
+        used_blocks = self.fat.used_blocks()
         free_blocks = len(self.fat.fat) - used_blocks
         total_blocks = len(self.fat.fat)
 
@@ -135,20 +205,18 @@ class FileSystemOperations:
             parts = path.strip("/").split("/")
             current_directory = self.root
             for part in parts:
-                for entry in current_directory:
-                    if entry.filename.strip() == part and entry.attributes == DIR_DIRECTORY:
-                        current_directory = self._load_directory(entry.first_block)
-                        break
-                else:
+                entry = self.find_dir_entry(current_directory, part)
+                if entry is None or entry.attributes != DIR_DIRECTORY:
                     print(f"Erro: Diretório '{path}' não encontrado.")
                     return
+                current_directory = self._load_directory(entry.first_block)
 
         # Listar o conteúdo do diretório atual
         print(f"Conteúdo do diretório '{path}':")
         for entry in current_directory:
             if entry.attributes != DIR_EMPTY:
                 tipo = "Diretório" if entry.attributes == DIR_DIRECTORY else "Arquivo"
-                print(f"{entry.filename.strip():<25} - {tipo} - {entry.size} bytes")
+                print(f"{entry.name:<25} - {tipo} - {entry.size} bytes")
 
     def create(self, path):
         """Cria um novo arquivo no diretório raiz ou em um subdiretório."""
@@ -167,20 +235,17 @@ class FileSystemOperations:
         # Navegar até o subdiretório, se necessário
         current_directory = self.root
         for part in parts[:-1]:  # Itera pelos diretórios no caminho
-            for entry in current_directory:
-                if entry.filename.strip() == part and entry.attributes == DIR_DIRECTORY:
-                    current_directory = self._load_directory(entry.first_block)
-                    break
-            else:
+            entry = self.find_dir_entry(current_directory, part)
+            if entry is None or entry.attributes != DIR_DIRECTORY:
                 raise FileNotFoundError(f"Erro: Diretório '{part}' não encontrado.")
+            current_directory = self._load_directory(entry.first_block)
 
         # Verificar se o arquivo já existe
-        for entry in current_directory:
-            if entry.filename.strip() == file_name and entry.attributes != DIR_EMPTY:
-                raise FileExistsError(f"Erro: Arquivo '{file_name}' já existe.")
+        if self.find_dir_entry(current_directory, file_name) is not None:
+            raise FileExistsError(f"Erro: Arquivo '{file_name}' já existe.")
 
         # Procurar uma entrada vazia no diretório atual
-        for entry in current_directory:
+        for i, entry in enumerate(current_directory):
             if entry.attributes == DIR_EMPTY:
                 # Encontrar um bloco livre na FAT
                 free_block = self.fat.find_free_block()
@@ -188,11 +253,16 @@ class FileSystemOperations:
                     raise RuntimeError("Erro: Não há blocos livres disponíveis.")
 
                 # Atualizar a FAT e criar a entrada do arquivo
-                self.fat.fat[free_block] = FAT_EOF
-                entry.filename = file_name.ljust(25)[:25]
-                entry.attributes = DIR_FILE
-                entry.first_block = free_block
-                entry.size = 0
+                self.fat.mark_used(free_block)
+                self._dirty_fat.add(free_block)
+                current_directory[i] = DirectoryEntry(
+                    filename=file_name,
+                    attributes=DIR_FILE,
+                    first_block=free_block,
+                    size=0,
+                )
+                if current_directory is self.root:
+                    self._dirty_root.add(i)
                 break
         else:
             raise RuntimeError("Erro: Diretório cheio. Não é possível criar novos arquivos.")
@@ -204,31 +274,44 @@ class FileSystemOperations:
 
     def _load_directory(self, block_number):
         """Carrega um diretório a partir de um bloco."""
-        with open(FILESYSTEM, "rb") as f:
-            f.seek(block_number * BLOCK_SIZE)
-            data = f.read(BLOCK_SIZE)
-            return [DirectoryEntry.from_bytes(data[i * 32: (i + 1) * 32]) for i in range(ROOT_ENTRIES)]
+        offset = block_number * BLOCK_SIZE
+        return self._directory_from_bytes(self._ensure_mapped()[offset:offset + BLOCK_SIZE])
 
     def _persist_directory(self, directory, block_number):
         """Persiste um diretório no disco."""
-        with open(FILESYSTEM, "r+b") as f:
-            f.seek(block_number * BLOCK_SIZE)
-            directory_data = b"".join(entry.to_bytes() for entry in directory)
-            f.write(directory_data)
+        self._pack_directory(directory, self._ensure_mapped(), block_number * BLOCK_SIZE)
+
+    def _directory_from_bytes(self, data):
+        """Decodifica as entradas de um diretório de uma só vez."""
+        data = memoryview(data)[:ROOT_ENTRIES * _ENTRY_STRUCT.size]
+        return Directory(DirectoryEntry.from_tuple(fields) for fields in _ENTRY_STRUCT.iter_unpack(data))
+
+    def _pack_directory(self, directory, buffer, offset):
+        """Escreve as entradas de um diretório em um buffer a partir do offset."""
+        for i, entry in enumerate(directory):
+            entry.pack_into(buffer, offset + i * _ENTRY_STRUCT.size)
+
+    def load_filesystem(self, force=False):
+        """Carrega a FAT e o diretório raiz do disco, se ainda não estiverem em memória."""
+        if self._loaded and not force:
+            return
 
-    def load_filesystem(self):
-        """Carrega a FAT e o diretório raiz do disco."""
         if not os.path.exists(FILESYSTEM):
             raise FileNotFoundError("Sistema de arquivos não encontrado. Execute o comando 'init' primeiro.")
 
-        with open(FILESYSTEM, "rb") as f:
-            # Carregar FAT
-            fat_data = f.read(FAT_BLOCKS * BLOCK_SIZE)
-            self.fat.from_bytes(fat_data)
+        mm = self._ensure_mapped()
+
+        # Carregar FAT
+        self.fat.from_bytes(mm[:FAT_BLOCKS * BLOCK_SIZE])
 
-            # Carregar diretório raiz
-            root_data = f.read(ROOT_BLOCKS * BLOCK_SIZE)
-            self.root = [DirectoryEntry.from_bytes(root_data[i * 32: (i + 1) * 32]) for i in range(ROOT_ENTRIES)]
+        # Carregar diretório raiz
+        root_offset = FAT_BLOCKS * BLOCK_SIZE
+        self.root = self._directory_from_bytes(mm[root_offset:root_offset + ROOT_BLOCKS * BLOCK_SIZE])
+
+        # O estado em memória agora corresponde ao disco
+        self._dirty_fat.clear()
+        self._dirty_root.clear()
+        self._loaded = True
 
         print("Sistema de arquivos carregado com sucesso.")
 
@@ -273,10 +356,8 @@ class FileSystemOperations:
     
     def find_dir_entry(self, directory, name):
         """Procura por uma entrada de diretório com o nome especificado."""
-        for entry in directory:
-            if entry.filename.strip() == name and entry.attributes != DIR_EMPTY:
-                return entry
-        return None
+        index = directory.find(name)
+        return None if index is None else directory[index]
     
     def is_directory_empty(self, dir_entry):
         """Verifica se um diretório está vazio."""
@@ -288,32 +369,43 @@ class FileSystemOperations:
     
     def free_fat_blocks(self, first_block):
         """Libera os blocos na FAT começando pelo bloco especificado."""
+        # Percorre a cadeia primeiro e libera todos os blocos de uma vez
+        fat = self.fat.fat  # Referência local evita buscas de atributo a cada iteração
+        chain = []
         current_block = first_block
         while current_block != FAT_EOF:
-            next_block = self.fat.fat[current_block]
-            self.fat.fat[current_block] = FAT_FREE  # Marca o bloco como livre
-            current_block = next_block
+            # Uma cadeia válida nunca tem mais blocos que a FAT; mais que isso indica um ciclo
+            if len(chain) >= len(fat):
+                raise RuntimeError("Cadeia de blocos da FAT corrompida (ciclo detectado).")
+            chain.append(current_block)
+            current_block = fat[current_block]
+
+        self.fat.free_blocks(chain)  # Marca os blocos como livres
+        self._dirty_fat.update(chain)
 
     def remove_dir_entry(self, directory, name):
         """Remove a entrada de diretório pelo nome."""
-        for entry in directory:
-            if entry.filename.strip() == name:
-                entry.attributes = DIR_EMPTY  # Marca como vazio
-                entry.first_block = 0
-                entry.size = 0
-                return
+        index = directory.find(name)
+        if index is not None:
+            directory[index] = DirectoryEntry()  # Marca como vazio
+            if directory is self.root:
+                self._dirty_root.add(index)
             
     def persist_changes(self):
-        """Persiste a FAT e o diretório raiz no disco."""
-        with open(FILESYSTEM, "r+b") as f:
-            # Atualiza a FAT
-            f.seek(0)
-            f.write(self.fat.to_bytes())
-
-            # Atualiza o diretório raiz
-            root_bytes = [entry.to_bytes() for entry in self.root]
-            f.seek(FAT_BLOCKS * BLOCK_SIZE)
-            f.write(b"".join(root_bytes))
+        """Persiste no disco apenas as entradas alteradas da FAT e do diretório raiz."""
+        mm = self._ensure_mapped()
+
+        # Atualiza as entradas alteradas da FAT
+        self.fat.pack_entries_into(mm, 0, self._dirty_fat)
+
+        # Atualiza as entradas alteradas do diretório raiz
+        root_offset = FAT_BLOCKS * BLOCK_SIZE
+        for index in self._dirty_root:
+            self.root[index].pack_into(mm, root_offset + index * _ENTRY_STRUCT.size)
+
+        self._dirty_fat.clear()
+        self._dirty_root.clear()
+
 
 
 
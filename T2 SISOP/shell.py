@@ -4,59 +4,77 @@ class FileSystemShell:
     """Shell para interação com o sistema de arquivos."""
     def __init__(self):
         self.fs_ops = FileSystemOperations()
+        self._dispatch = {
+            "init": self._cmd_init,
+            "ls": self._cmd_ls,
+            "load": self._cmd_load,
+            "mkdir": self._cmd_mkdir,
+            "fatinfo": self._cmd_fatinfo,
+            "create": self._cmd_create,
+            "unlink": self._cmd_unlink,
+            "exit": self._cmd_exit,
+        }
+        # Comandos que só são reconhecidos quando digitados sem argumentos
+        self._no_arg_commands = {"init", "load", "fatinfo", "exit"}
 
     def run(self):
         print("Bem-vindo ao shell do sistema de arquivos!")
         while True:
             command = input("fs> ").strip()
-            if command == "exit":
-                print("Encerrando o sistema...")
+            verb, _, arg = command.partition(" ")
+            handler = self._dispatch.get(verb)
+            if handler is None or (arg and verb in self._no_arg_commands):
+                print("Comando não reconhecido.")
+            elif handler(arg):  # Retorna True para encerrar o shell
                 break
 
-            elif command == "init":
-                self.fs_ops.initialize_filesystem()
-            
-            elif command.startswith("ls"):
-                parts = command.split(" ", 1)
-                if len(parts) == 1:  # Sem argumentos, listar o diretório raiz
-                    self.fs_ops.list_directory("/")
-                else:  # Com caminho, listar o diretório especificado
-                    self.fs_ops.list_directory(parts[1])
-
-
-            elif command == "load":
-                try:
-                    self.fs_ops.load_filesystem()
-                except FileNotFoundError as e:
-                    print(e)    
-
-            elif command.startswith("mkdir"):
-                try:
-                    _, path = command.split(" ", 1) 
-                    self.fs_ops.mkdir(path)
-                except ValueError:
-                    print("Uso: mkdir /caminho/diretorio")
-
-            elif command == "fatinfo":
-                self.fs_ops.fat_info()
-            
-            elif command.startswith("create"):
-                try:
-                    _, path = command.split(" ", 1)
-                    self.fs_ops.create(path)
-                except ValueError:
-                    print("Uso: create /caminho/arquivo")
-
-            elif command.startswith("unlink"):
-                try:
-                    _, path = command.split(" ", 1)
-                    self.fs_ops.unlink(path)
-                except ValueError:
-                    print("Uso: unlink /caminho/arquivo_ou_diretorio")
-                except FileNotFoundError as e:
-                    print(e)
-                except Exception as e:
-                    print(f"Erro ao remover: {e}")
-
-            else:
-                print("Comando não reconhecido.")
+    def _cmd_exit(self, arg):
+        print("Encerrando o sistema...")
+        self.fs_ops.close()
+        return True
+
+    def _cmd_init(self, arg):
+        self.fs_ops.initialize_filesystem()
+
+    def _cmd_ls(self, arg):
+        if not arg:  # Sem argumentos, listar o diretório raiz
+            self.fs_ops.list_directory("/")
+        else:  # Com caminho, listar o diretório especificado
+            self.fs_ops.list_directory(arg)
+
+    def _cmd_load(self, arg):
+        try:
+            self.fs_ops.load_filesystem(force=True)
+        except FileNotFoundError as e:
+            print(e)
+
+    def _cmd_mkdir(self, arg):
+        try:
+            if not arg:
+                raise ValueError
+            self.fs_ops.mkdir(arg)
+        except ValueError:
+            print("Uso: mkdir /caminho/diretorio")
+
+    def _cmd_fatinfo(self, arg):
+        self.fs_ops.fat_info()
+
+    def _cmd_create(self, arg):
+        try:
+            if not arg:
+                raise ValueError
+            self.fs_ops.create(arg)
+        except ValueError:
+            print("Uso: create /caminho/arquivo")
+
+    def _cmd_unlink(self, arg):
+        try:
+            if not arg:
+                raise ValueError
+            self.fs_ops.unlink(arg)
+        except ValueError:
+            print("Uso: unlink /caminho/arquivo_ou_diretorio")
+        except FileNotFoundError as e:
+            print(e)
+        except Exception as e:
+            print(f"Erro ao remover: {e}")